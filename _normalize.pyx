@@ -0,0 +1,41 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Optional C build of replacer.normalize().
+
+Build in place with `cythonize -i _normalize.pyx`; replacer.py falls back to
+its pure-Python normalize() when this module is not compiled.
+"""
+
+
+cdef inline bint _is_punct(Py_UCS4 c):
+    return c in u'"\',.?!:;()'
+
+
+cpdef str normalize(str text):
+    """Strip HTML tags, punctuation, and lowercase for matching."""
+    cdef Py_ssize_t n = len(text)
+    cdef Py_ssize_t i = 0, start = 0, j
+    cdef Py_UCS4 c
+    cdef list parts = []
+    # One scan collects the runs kept between tags and punctuation
+    while i < n:
+        c = text[i]
+        if c == u'<':
+            # Same as <[^>]+>: at least one character before the closing '>'
+            if i + 1 < n and text[i + 1] != u'>':
+                j = text.find(u'>', i + 2)
+                if j != -1:
+                    if start < i:
+                        parts.append(text[start:i])
+                    i = start = j + 1
+                    continue
+        elif _is_punct(c):
+            if start < i:
+                parts.append(text[start:i])
+            i = start = i + 1
+            continue
+        i += 1
+    if start == 0:
+        return text.strip().lower()  # nothing removed, skip the join
+    parts.append(text[start:])
+    return u''.join(parts).strip().lower()
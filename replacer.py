@@ -1,17 +1,61 @@
+import contextlib
 import csv
+import gc
+import io
 import re
+import string
 import os
 import sys
 import argparse
 import logging
+import logging.handlers
+import mmap
+import operator
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_PUNCT = '"\',.?!:;()'
+_PUNCT_TBL = str.maketrans('', '', _PUNCT)
+# For ASCII text: lowercase A-Z and drop punctuation in a single translate pass
+_ASCII_NORM_TBL = str.maketrans(string.ascii_uppercase, string.ascii_lowercase, _PUNCT)
+_TAG_BRE = re.compile(rb'<[^>]+>')
+_PUNCT_BYTES = _PUNCT.encode('ascii')
+_ASCII_LOWER_BYTES = bytes.maketrans(string.ascii_uppercase.encode('ascii'), string.ascii_lowercase.encode('ascii'))
+_ASCII_SPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'  # what str.strip() removes from ASCII text
+# A msgid line immediately followed by an empty msgstr line; group 2 is the msgstr line
+_ENTRY_RE = re.compile(rb'^msgid[ \t]+"(.*)".*\n([ \t]*msgstr "")[ \t\r\f\v]*$', re.MULTILINE)
+_BUFFER_SIZE = 1 << 20  # 1 MiB buffers for the large Item CSVs and the .po output
+
+logger = logging.getLogger(__name__)
 
 
 def normalize(text: str) -> str:
     """Strip HTML tags, punctuation, and lowercase for matching."""
-    text = re.sub(r'<[^>]+>', '', text)  # Strip tags
-    text = re.sub(r'[\"\',.?!:;()]|', '', text)  # Strip punctuation
-    return text.strip().lower()
+    if '<' in text:
+        text = _TAG_RE.sub('', text)
+    if text.isascii():
+        return text.translate(_ASCII_NORM_TBL).strip()
+    return text.translate(_PUNCT_TBL).strip().lower()
+
+
+try:
+    from _normalize import normalize  # optional compiled build, see _normalize.pyx
+except ImportError:
+    pass
+
+
+def normalize_bytes(raw: bytes) -> bytes:
+    """
+    normalize() for a UTF-8 encoded msgid, returning the encoded key.
+    ASCII input (every EN msgid) is handled on the bytes directly without decoding.
+    """
+    if not raw.isascii():
+        return normalize(raw.decode('utf-8')).encode('utf-8')
+    if b'<' in raw:
+        raw = _TAG_BRE.sub(b'', raw)
+    return raw.translate(_ASCII_LOWER_BYTES, _PUNCT_BYTES).strip(_ASCII_SPACE)
 
 
 def load_mapping(csv_path: str, key_col: str, val_cols: list[str], normalize_key=False) -> dict:
@@ -19,69 +63,99 @@ def load_mapping(csv_path: str, key_col: str, val_cols: list[str], normalize_key
     Load a CSV mapping:
       - If normalize_key is True: map normalized val_col -> key_col for each val_col in val_cols
       - Else: map key_col -> first val_col
+    Item IDs (key_col) are stored as int, which hash and compare faster than str.
     Skips first three header lines.
     """
-    mapping = {}
-    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+    with io.TextIOWrapper(open(csv_path, 'rb', buffering=_BUFFER_SIZE),
+                          encoding='utf-8-sig', newline='') as f:
+        # A real CSV parser is required: Description comes before Name and holds quoted
+        # commas and line breaks, so splitting lines on ',' would misplace columns
         reader = csv.reader(f)
         cols = next(reader)
         names = next(reader)
         next(reader)
         key_idx = cols.index(key_col)
         val_idxs = [names.index(v) for v in val_cols]
-        for row in reader:
-            if len(row) <= max(key_idx, *val_idxs):
-                continue
-            item_id = row[key_idx].strip('"')
-            if not item_id:
-                continue
-            if normalize_key:
-                for val_idx in val_idxs:
-                    name = row[val_idx].strip('"')
-                    if name:
-                        mapping[normalize(name)] = item_id
-            else:
-                name = row[val_idxs[0]].strip('"')
-                if name:
-                    mapping[item_id] = name
-    return mapping
+        # Pull the wanted columns out of each row in C rather than indexing per cell
+        pick = operator.itemgetter(key_idx, *val_idxs)
+        width = max(key_idx, *val_idxs)
+        # csv.reader has already unquoted every cell, so the picked values are used as-is
+        rows = (pick(row) for row in reader if len(row) > width)
+        if normalize_key:
+            return {normalize(name): int(item_id)
+                    for item_id, *vals in rows if item_id
+                    for name in vals if name}
+        return {int(item_id): vals[0] for item_id, *vals in rows if item_id and vals[0]}
+
+
+@contextlib.contextmanager
+def map_po(po_path: str):
+    """Map a .po file read-only into memory (empty files yield b'')."""
+    with open(po_path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''  # mmap refuses empty files
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def write_all(path: str, data: bytearray):
+    """Write data to path straight through the file descriptor, in 1 MiB chunks."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        with memoryview(data) as view:
+            offset = 0
+            while offset < len(view):
+                offset += os.write(fd, view[offset:offset + _BUFFER_SIZE])
+    finally:
+        os.close(fd)
 
 
-def translate(po_in: str, po_out: str, eng_map: dict, id_map: dict, src: str, tgt: str):
+def translate(po_in: str, po_out: str, name_map: dict, src: str, tgt: str):
     """
-    Replace empty msgstr in .po using eng_map and id_map, logging each action.
+    Replace empty msgstr in .po using name_map (UTF-8 encoded normalized source name ->
+    (target name, ID)), logging each action.
     """
     start = time.time()
     total = replaced = 0
-    missing = []
-    logging.info(f"Translating {src.upper()}→{tgt.upper()}: '{po_in}'→'{po_out}'")
-    with open(po_in, encoding='utf-8') as fin, open(po_out, 'w', encoding='utf-8') as fout:
-        msgid = None
-        for line in fin:
-            if line.startswith('msgid '):
-                match = re.match(r'msgid\s+\"(.*)\"', line)
-                msgid = match.group(1) if match else None
-                fout.write(line)
-                continue
-            if msgid and line.strip() == 'msgstr ""':
-                total += 1
-                item_id = eng_map.get(normalize(msgid))
-                tgt_name = id_map.get(item_id, '') if item_id else ''
-                if tgt_name:
-                    fout.write(f'msgstr "{tgt_name}"\n')
-                    replaced += 1
-                    logging.info(f"Replaced '{msgid}'→'{tgt_name}' (ID={item_id})")
-                else:
-                    fout.write(line)
-                    missing.append(msgid)
-                    logging.warning(f"No mapping for '{msgid}'")
-                msgid = None
+    missing = 0
+    logger.info(f"Translating {src.upper()}→{tgt.upper()}: '{po_in}'→'{po_out}'")
+    # Checked once up front so the per-entry log calls cost nothing when filtered out
+    log_info = logger.isEnabledFor(logging.INFO)
+    log_warning = logger.isEnabledFor(logging.WARNING)
+    # The same msgid recurs across contexts; remember each one's lookup result,
+    # with () marking a known miss, so repeats skip normalizing and the lookup
+    resolved = {}
+    out = bytearray()
+    with map_po(po_in) as buf:
+        pos = 0
+        for match in _ENTRY_RE.finditer(buf):
+            msgid = match.group(1)
+            if not msgid:
                 continue
-            fout.write(line)
+            total += 1
+            hit = resolved.get(msgid)
+            if hit is None:
+                hit = resolved[msgid] = name_map.get(normalize_bytes(msgid), ())
+            if hit:
+                tgt_name, item_id = hit
+                # Splice the new msgstr over the empty one, copying everything before it as-is
+                out += buf[pos:match.start(2)]
+                out += f'msgstr "{tgt_name}"'.encode('utf-8')
+                pos = match.end(2)
+                replaced += 1
+                if log_info:
+                    logger.info("Replaced '%s'→'%s' (ID=%s)", msgid.decode('utf-8'), tgt_name, item_id)
+            else:
+                missing += 1
+                if log_warning:
+                    logger.warning("No mapping for '%s'", msgid.decode('utf-8'))
+        out += buf[pos:]
+    write_all(po_out, out)
     elapsed = time.time() - start
-    logging.info(f"Processed {total} entries, {replaced} replacements in {elapsed:.2f}s")
+    logger.info(f"Processed {total} entries, {replaced} replacements in {elapsed:.2f}s")
     if missing:
-        logging.info(f"Missing mappings for {len(missing)} entries.")
+        logger.info(f"Missing mappings for {missing} entries.")
 
 
 def main():
@@ -95,6 +169,7 @@ def main():
     parser.add_argument('--csv-dir', default='csv', help='Directory of Item_<lang>.csv files')
     parser.add_argument('--src', choices=['en','jp','de','fr'], default='en', help='Source language (default: en)')
     parser.add_argument('--tgt', choices=['en','jp','de','fr'], default='jp', help='Target language (default: jp)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Also print every log record to the console')
 
     # override error to show help
     def custom_error(message):
@@ -113,38 +188,62 @@ def main():
     if args.src == args.tgt:
         parser.error(f"Source ({args.src}) and target ({args.tgt}) languages must differ.")
 
+    log_format = '%(asctime)s %(levelname)s: %(message)s'
+    # Buffer file records and write them out in batches; warnings and errors flush right away
+    file_handler = logging.FileHandler('replacer.log', 'w', 'utf-8')
+    file_handler.setFormatter(logging.Formatter(log_format))
+    console = logging.StreamHandler()
+    if not args.verbose:
+        console.setLevel(logging.ERROR)  # keep the per-entry records off the terminal
     logging.basicConfig(level=logging.INFO,
-                        format='%(asctime)s %(levelname)s: %(message)s',
-                        handlers=[logging.FileHandler('replacer.log', 'w', 'utf-8'), logging.StreamHandler()])
-    logging.info('=== Script Start ===')
+                        format=log_format,
+                        handlers=[logging.handlers.MemoryHandler(4096, flushLevel=logging.WARNING,
+                                                                 target=file_handler),
+                                  console])
+    logger.info('=== Script Start ===')
 
     # determine file names
     try:
         en_csv = os.path.join(args.csv_dir, f'Item_{args.src.upper()}.csv')
         tgt_csv = os.path.join(args.csv_dir, f'Item_{args.tgt.upper()}.csv')
     except FileNotFoundError as e:
-        logging.error(f"Can't find CSV file: {e.filename}")
+        logger.error(f"Can't find CSV file: {e.filename}")
         sys.exit(1)
     except Exception as e:
-        logging.error(f"Error has occurred while loading the map.: {e}")
+        logger.error(f"Error has occurred while loading the map.: {e}")
         sys.exit(1)
     out_po = args.po_out or args.po_in.replace('.po', f'.{args.tgt}.po')
 
-    # load mappings
-    try:
-        eng_map = load_mapping(en_csv, 'key', ['Singular', 'Name'], normalize_key=True)
-        id_map = load_mapping(tgt_csv, 'key', ['Name'], normalize_key=False)
-    except Exception as e:
-        logging.error(f"Error has occurred while loading the map.: {e}")
-        sys.exit(1)
-    logging.info(f"Loaded {len(eng_map)} {args.src}->ID, {len(id_map)} ID->{args.tgt}")
-
+    # Loading allocates tens of thousands of small objects that all survive;
+    # keep the cyclic GC from rescanning them over and over
+    gc.disable()
     try:
-        translate(args.po_in, out_po, eng_map, id_map, args.src, args.tgt)
-    except Exception as e:
-        logging.exception("An unexpected error has occurred during translation.")
-        sys.exit(1)
-    logging.info('=== Script End ===')
+        # load mappings
+        try:
+            # The two CSVs are independent; overlap their reads
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                eng_future = pool.submit(load_mapping, en_csv, 'key', ['Singular', 'Name'], normalize_key=True)
+                id_future = pool.submit(load_mapping, tgt_csv, 'key', ['Name'], normalize_key=False)
+                eng_map, id_map = eng_future.result(), id_future.result()
+        except Exception as e:
+            logger.error(f"Error has occurred while loading the map.: {e}")
+            sys.exit(1)
+        logger.info(f"Loaded {len(eng_map)} {args.src}->ID, {len(id_map)} ID->{args.tgt}")
+        # Resolve source name -> ID -> target name once, so translate() needs a single lookup
+        # Keys are encoded to match normalize_bytes() on the raw msgids
+        name_map = {name.encode('utf-8'): (id_map[item_id], item_id)
+                    for name, item_id in eng_map.items() if item_id in id_map}
+        del eng_map, id_map
+        gc.freeze()  # the maps live until exit; keep them out of later collections
+
+        try:
+            translate(args.po_in, out_po, name_map, args.src, args.tgt)
+        except Exception as e:
+            logger.exception("An unexpected error has occurred during translation.")
+            sys.exit(1)
+    finally:
+        gc.enable()
+    logger.info('=== Script End ===')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file